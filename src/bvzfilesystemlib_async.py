@@ -0,0 +1,131 @@
+"""
+Opt-in asyncio versions of some of the bvzfilesystemlib functions. These are intended for slow, high latency filesystems
+(network mounts in particular) where the blocking versions spend most of their time waiting on individual metadata
+calls. Each filesystem call is run on a thread pool sized to the given concurrency limit (rather than asyncio's default
+executor, which is capped at a few dozen threads), so that many of them are kept in flight at once. The pool is shut
+down without waiting when a call finishes, so cancelling a call (or a timeout) never blocks the event loop on
+filesystem calls that are still in flight.
+
+The regular, blocking API in bvzfilesystemlib is unchanged. Requires Python 3.9 or later.
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import os
+
+import bvzfilesystemlib
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+async def count_files_recursively_async(dir_d,
+                                        concurrency=64):
+    """
+    Async version of bvzfilesystemlib.count_files_recursively. Given a directory, returns the number of files in that
+    directory AND all subdirectories. Subdirectories are scanned concurrently.
+
+    :param dir_d:
+            The directory to count.
+    :param concurrency:
+            The number of directories being scanned at the same time. Defaults to 64.
+
+    :return:
+            An integer of the number of files found.
+    """
+
+    assert type(dir_d) is str
+    assert type(concurrency) is int and concurrency > 0
+
+    if not os.path.exists(dir_d):
+        raise ValueError(f"{dir_d} does not exist.")
+    if not os.path.isdir(dir_d):
+        raise ValueError(f"{dir_d} is not a directory.")
+
+    loop = asyncio.get_running_loop()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+
+    # Same design as bvzfilesystemlib._parallel_walk: a fixed set of workers pull directories off a shared queue and
+    # push any subdirectories back onto it, so the number of tasks stays at concurrency no matter how big the tree is.
+    queue = asyncio.Queue()
+    queue.put_nowait(dir_d)
+    state = {"count": 0}
+
+    async def worker():
+        while True:
+            path_d = await queue.get()
+            try:
+                files_p, subdirs_d = await loop.run_in_executor(executor, bvzfilesystemlib._scan_dir, path_d)
+                state["count"] += len(files_p)
+                for subdir_d in subdirs_d:
+                    queue.put_nowait(subdir_d)
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    join = asyncio.ensure_future(queue.join())
+
+    try:
+        # Workers only ever finish by raising, so stop at the first one that does rather than waiting on the rest.
+        await asyncio.wait(workers + [join], return_when=asyncio.FIRST_COMPLETED)
+        for task in workers:
+            if task.done():
+                task.result()
+        return state["count"]
+    finally:
+        for task in workers + [join]:
+            task.cancel()
+        await asyncio.gather(*workers, join, return_exceptions=True)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+async def dir_files_keyed_by_size_async(path_d,
+                                        concurrency=64):
+    """
+    Async version of bvzfilesystemlib.dir_files_keyed_by_size. Builds a dictionary of file sizes in a directory. The
+    key is the file size, the value is a list of file names. The files are stat'ed concurrently.
+
+    :param path_d:
+            The dir that contains the files we are evaluating. Does not traverse into subdirectories.
+    :param concurrency:
+            The number of threads stat'ing files at the same time. Defaults to 64.
+
+    :return:
+            A dict where the key is the file size, the value is a list of paths to the files of this size.
+    """
+
+    assert type(path_d) is str
+    assert type(concurrency) is int and concurrency > 0
+
+    if not os.path.exists(path_d):
+        raise ValueError(f"{path_d} does not exist.")
+    if not os.path.isdir(path_d):
+        raise ValueError(f"{path_d} is not a directory.")
+
+    loop = asyncio.get_running_loop()
+
+    def list_files():
+        with os.scandir(path_d) as scandir_it:
+            return [entry for entry in scandir_it if entry.is_file()]
+
+    def stat_sizes(entries):
+        return [(entry.stat().st_size, entry.path) for entry in entries]
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+
+    try:
+        entries = await loop.run_in_executor(executor, list_files)
+
+        # Hand each worker thread an equal share of the files rather than creating a task per file, so the number of
+        # tasks stays at concurrency no matter how big the directory is.
+        batch_size = max(1, -(-len(entries) // concurrency))
+        batches = [entries[i:i + batch_size] for i in range(0, len(entries), batch_size)]
+        results = await asyncio.gather(*[loop.run_in_executor(executor, stat_sizes, batch) for batch in batches])
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    output = collections.defaultdict(list)
+    for result in results:
+        for file_size, file_p in result:
+            output[file_size].append(file_p)
+    return dict(output)
@@ -0,0 +1,172 @@
+# cython: language_level=3
+"""
+Optional C accelerated directory scanning for bvzfilesystemlib. Reads directory entries with getdents64 directly and
+uses the d_type field of each entry to tell files from directories, so no stat is needed for regular files and
+directories, and no DirEntry objects are created. Linux only. bvzfilesystemlib uses this to scan each directory of its
+(multithreaded) tree walk. If this extension has not been built, it falls back to os.scandir.
+
+Build in place with:
+
+    cythonize -i bvzfilesystemlib_fastwalk.pyx
+
+The results match os.walk: symlinks to directories are neither listed as files nor returned as subdirectories, and a
+directory that cannot be read is treated as empty.
+"""
+
+from libc.stdint cimport uint64_t
+
+
+cdef extern from "Python.h":
+    object PyUnicode_DecodeFSDefaultAndSize(const char *s, Py_ssize_t size)
+
+cdef extern from "<fcntl.h>" nogil:
+    int O_RDONLY
+    int O_DIRECTORY
+    int O_CLOEXEC
+    int AT_SYMLINK_NOFOLLOW
+    int open(const char *path, int flags, ...)
+
+cdef extern from "<unistd.h>" nogil:
+    long syscall(long number, ...)
+    int close(int fd)
+
+cdef extern from "<sys/syscall.h>" nogil:
+    long SYS_getdents64
+
+cdef extern from "<sys/stat.h>" nogil:
+    struct stat:
+        unsigned int st_mode
+    int fstatat(int dirfd, const char *path, stat *buf, int flags)
+    bint S_ISDIR(unsigned int mode)
+
+cdef extern from "<dirent.h>" nogil:
+    unsigned char DT_UNKNOWN
+    unsigned char DT_DIR
+    unsigned char DT_LNK
+
+cdef extern from *:
+    """
+    #include <stdint.h>
+    struct bvz_linux_dirent64 {
+        uint64_t       d_ino;
+        int64_t        d_off;
+        unsigned short d_reclen;
+        unsigned char  d_type;
+        char           d_name[];
+    };
+    """
+    struct bvz_linux_dirent64:
+        unsigned short d_reclen
+        unsigned char d_type
+        char d_name[1]
+
+
+# The size of the getdents64 buffer, in 8 byte words (32KB).
+cdef enum:
+    BUF_WORDS = 4096
+
+# Values returned by _classify.
+cdef enum:
+    ENTRY_FILE = 0
+    ENTRY_DIR = 1
+    ENTRY_SKIP = 2
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+cdef inline int _classify(int dir_fd, bvz_linux_dirent64 *entry) nogil:
+    """
+    Works out whether a directory entry should be counted as a file, traversed as a directory, or skipped. Only issues
+    a stat when the filesystem did not report the type, or when the entry is a symlink (which is a file unless it points
+    to a directory).
+    """
+
+    cdef stat st
+    cdef unsigned char d_type = entry.d_type
+
+    if d_type == DT_DIR:
+        return ENTRY_DIR
+
+    if d_type == DT_UNKNOWN:
+        if fstatat(dir_fd, entry.d_name, &st, AT_SYMLINK_NOFOLLOW) == 0:
+            if S_ISDIR(st.st_mode):
+                return ENTRY_DIR
+            if fstatat(dir_fd, entry.d_name, &st, 0) == 0 and S_ISDIR(st.st_mode):
+                return ENTRY_SKIP
+        return ENTRY_FILE
+
+    if d_type == DT_LNK:
+        if fstatat(dir_fd, entry.d_name, &st, 0) == 0 and S_ISDIR(st.st_mode):
+            return ENTRY_SKIP
+
+    return ENTRY_FILE
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def scan_dir_c(bytes path):
+    """
+    Lists the contents of a single directory. A drop in replacement for bvzfilesystemlib._scan_dir, so it can be called
+    from each of the worker threads of bvzfilesystemlib._parallel_walk. The GIL is released around every system call so
+    that those threads can overlap their I/O.
+
+    :param path:
+            The directory to list, as bytes (see os.fsencode).
+
+    :return:
+            A tuple containing a list of the paths (as str) of the files in this directory, and a list of the paths (as
+            str) of the subdirectories that should be traversed.
+    """
+
+    # Declared as uint64_t (rather than char) so that the linux_dirent64 records cast out of it are suitably aligned.
+    cdef uint64_t buf[BUF_WORDS]
+    cdef const char *c_path = path
+    cdef long nread
+    cdef long pos
+    cdef int dir_fd
+    cdef int kind
+    cdef bvz_linux_dirent64 *entry
+    cdef bytes dir_p
+    cdef bytes entry_p
+    cdef const char *name
+    cdef list files_p = []
+    cdef list subdirs_d = []
+
+    with nogil:
+        dir_fd = open(c_path, O_RDONLY | O_DIRECTORY | O_CLOEXEC)
+    if dir_fd < 0:
+        return files_p, subdirs_d
+
+    dir_p = path if path.endswith(b"/") else path + b"/"
+
+    try:
+        while True:
+            with nogil:
+                nread = syscall(SYS_getdents64, dir_fd, buf, sizeof(buf))
+            if nread <= 0:
+                break
+
+            pos = 0
+            while pos < nread:
+                entry = <bvz_linux_dirent64 *> (<char *> buf + pos)
+                pos += entry.d_reclen
+
+                name = entry.d_name
+                if name[0] == c'.' and (name[1] == 0 or (name[1] == c'.' and name[2] == 0)):
+                    continue
+
+                if entry.d_type == DT_LNK or entry.d_type == DT_UNKNOWN:
+                    with nogil:
+                        kind = _classify(dir_fd, entry)
+                else:
+                    kind = _classify(dir_fd, entry)
+
+                if kind == ENTRY_SKIP:
+                    continue
+                entry_p = dir_p + name
+                if kind == ENTRY_FILE:
+                    files_p.append(PyUnicode_DecodeFSDefaultAndSize(entry_p, len(entry_p)))
+                else:
+                    subdirs_d.append(PyUnicode_DecodeFSDefaultAndSize(entry_p, len(entry_p)))
+    finally:
+        close(dir_fd)
+
+    return files_p, subdirs_d